@@ -0,0 +1,194 @@
+"""
+Contrôle d'admission par client et ordonnancement équitable des analyses
+
+- Chaque client (clé d'API, sinon adresse IP) dispose d'un seau à jetons :
+  au-delà de son débit, les requêtes sont refusées (429 + Retry-After).
+- Les analyses admises attendent un créneau de worker dans une file
+  pondérée (weighted fair queueing) : les requêtes interactives passent
+  devant les traitements de masse sans que ceux-ci soient affamés.
+
+Les clés d'API sont déclarées dans API_KEYS (JSON), par exemple :
+    {"cle-ui": {"tenant": "gradio-ui", "priority": "interactive", "rate": 50, "burst": 200},
+     "cle-backfill": {"tenant": "data-team", "priority": "bulk", "rate": 5, "burst": 50}}
+
+L'interface Gradio passe par un seul conteneur : elle doit avoir sa propre clé
+(UI_API_KEY, voir docker-compose.yml) avec un quota large, sinon tous les
+recruteurs partageraient le seau de l'adresse du conteneur. Le trafic sans clé
+est identifié par adresse IP et traité avec la priorité ANONYMOUS_PRIORITY
+("bulk" par défaut) : seules les clés déclarées peuvent être interactives.
+
+Les flux NDJSON de /analyze-text consomment un jeton par CV : une intégration
+ATS qui envoie ses CV en masse doit avoir sa propre clé, avec un débit ("rate")
+et une rafale ("burst") à la mesure de son volume, sinon elle est bridée au
+débit par défaut (RATE_LIMIT_PER_S).
+
+Les opérations d'administration (profilage à la demande, reconstruction des
+statistiques) exigent l'en-tête X-Admin-Token égal à ADMIN_TOKEN.
+"""
+
+import asyncio
+import heapq
+import hmac
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+import metrics
+
+# Débit (requêtes/s) et rafale par défaut d'un client
+DEFAULT_RATE = float(os.getenv("RATE_LIMIT_PER_S", "2"))
+DEFAULT_BURST = float(os.getenv("RATE_LIMIT_BURST", "20"))
+
+# Poids de chaque classe de priorité dans l'ordonnancement
+PRIORITY_WEIGHTS = {"interactive": 16.0, "bulk": 1.0}
+# Priorité du trafic sans clé d'API
+ANONYMOUS_PRIORITY = os.getenv("ANONYMOUS_PRIORITY", "bulk")
+
+API_KEYS: Dict[str, Dict] = json.loads(os.getenv("API_KEYS", "{}"))
+
+# Jeton des opérations d'administration (désactivées si vide)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+metrics.describe("cv_admission_rejected_total", "counter",
+                 "Requêtes refusées (429) par le contrôle d'admission")
+metrics.describe("cv_admission_throttled_total", "counter",
+                 "Enregistrements NDJSON mis en attente faute de jeton")
+metrics.describe("cv_queue_wait_seconds", "summary",
+                 "Attente d'un créneau d'analyse, par client")
+
+
+class UnknownAPIKey(Exception):
+    pass
+
+
+def is_admin(token: Optional[str]) -> bool:
+    """Vérifie le jeton d'administration (comparaison à temps constant)."""
+    if not ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+class TokenBucket:
+    """Seau à jetons : `rate` jetons/s, au plus `burst` jetons accumulés."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, cost: float = 1) -> float:
+        """Consomme `cost` jetons ; retourne 0 si accepté, sinon l'attente en secondes."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= cost:
+                self.tokens -= cost
+                return 0.0
+            return (cost - self.tokens) / self.rate
+
+
+class Tenant:
+    def __init__(self, name: str, priority: str, bucket: TokenBucket):
+        self.name = name
+        self.priority = priority
+        self.bucket = bucket
+
+    @property
+    def weight(self) -> float:
+        return PRIORITY_WEIGHTS[self.priority]
+
+
+_tenants: Dict[str, Tenant] = {}
+_tenants_lock = threading.Lock()
+
+
+def resolve_tenant(api_key: Optional[str], client_host: str, priority: Optional[str] = None) -> Tenant:
+    """Identifie le client d'une requête.
+
+    Sans clé d'API, le client est identifié par son adresse et reçoit la
+    priorité ANONYMOUS_PRIORITY. L'en-tête de priorité permet seulement de se
+    déclasser en "bulk", jamais de se surclasser.
+    """
+    if api_key:
+        config = API_KEYS.get(api_key)
+        if config is None:
+            raise UnknownAPIKey()
+        name = config.get("tenant", api_key[:8])
+    else:
+        config = {"priority": ANONYMOUS_PRIORITY}
+        name = f"ip:{client_host}"
+
+    with _tenants_lock:
+        tenant = _tenants.get(name)
+        if tenant is None:
+            bucket = TokenBucket(float(config.get("rate", DEFAULT_RATE)),
+                                 float(config.get("burst", DEFAULT_BURST)))
+            tenant = Tenant(name, config.get("priority", "interactive"), bucket)
+            _tenants[name] = tenant
+
+    if priority == "bulk" and tenant.priority != "bulk":
+        return Tenant(tenant.name, "bulk", tenant.bucket)
+    return tenant
+
+
+class FairScheduler:
+    """File d'attente pondérée (WFQ) devant un nombre fixe de créneaux.
+
+    Chaque demande reçoit une étiquette de fin virtuelle
+    `max(temps virtuel, dernière fin du client) + 1 / poids` ; les créneaux
+    libérés sont attribués par étiquette croissante.
+    """
+
+    def __init__(self, slots: int):
+        self.free = slots
+        self.virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._waiting = []
+        self._seq = itertools.count()
+
+    async def acquire(self, tenant: Tenant):
+        start = max(self.virtual_time, self._last_finish.get(tenant.name, 0.0))
+        finish = start + 1.0 / tenant.weight
+        self._last_finish[tenant.name] = finish
+
+        if self.free > 0 and not self._waiting:
+            self.free -= 1
+            self.virtual_time = start
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (finish, next(self._seq), start, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Créneau attribué juste avant l'annulation : le rendre
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiting:
+            _, _, start, future = heapq.heappop(self._waiting)
+            if future.cancelled():
+                continue
+            self.virtual_time = start
+            future.set_result(None)
+            return
+        self.free += 1
+
+    @asynccontextmanager
+    async def slot(self, tenant: Tenant):
+        queued_at = time.perf_counter()
+        await self.acquire(tenant)
+        metrics.observe("cv_queue_wait_seconds", time.perf_counter() - queued_at, tenant=tenant.name)
+        try:
+            yield
+        finally:
+            self.release()
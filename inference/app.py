@@ -1,8 +1,29 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Depends, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
 import fitz
+import json
+import math
+import multiprocessing
+import os
 import re
-from typing import Dict, List
+import tempfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+import admission
+import metrics
+import pdf_pages
+import profiling
+import stats
+import store
+from workers import (
+    ANALYSIS_MAX_RSS_MB, ANALYSIS_TIMEOUT_S, ANALYSIS_WORKERS, WORKER_RECYCLE_RSS_MB,
+    AnalysisError, BudgetExceeded, WorkerPool,
+)
 
 app = FastAPI(title="CV Analyzer API")
 
@@ -59,11 +80,65 @@ TECHNICAL_SKILLS = {
 # ---------------------------
 # Extraire texte PDF
 # ---------------------------
+# Au-delà de ce nombre de pages, l'extraction est répartie sur plusieurs processus
+PARALLEL_PAGE_THRESHOLD = int(os.getenv("PARALLEL_PAGE_THRESHOLD", "64"))
+# Nombre de processus d'extraction par worker d'analyse (1 = extraction
+# séquentielle, par défaut). À activer après mesure sur la machine cible
+# (python benchmark.py pages), seuil compris : le gain dépend des coeurs libres.
+PDF_EXTRACT_PROCESSES = int(os.getenv("PDF_EXTRACT_PROCESSES", "1"))
+# Empreinte mémoire estimée d'un processus d'extraction, en Mo. Ces processus
+# restent vivants dans le groupe du worker : leur empreinte est ajoutée aux
+# budgets mémoire du pool de workers (voir startup). Mesure : python benchmark.py
+# pages. Lancer le service avec uvicorn (Dockerfile) : sous `python app.py`, les
+# processus spawn réimportent app.py comme module principal et pèsent davantage.
+PDF_EXTRACT_PROCESS_RSS_MB = int(os.getenv("PDF_EXTRACT_PROCESS_RSS_MB", "64"))
+
+_page_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_page_pool() -> ProcessPoolExecutor:
+    """Crée à la demande le pool de processus d'extraction."""
+    global _page_pool
+    if _page_pool is None:
+        # "spawn" : ne pas forker le processus uvicorn et ses threads
+        _page_pool = ProcessPoolExecutor(
+            max_workers=PDF_EXTRACT_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _page_pool
+
+
+def _page_pool_rss_mb() -> int:
+    """Empreinte mémoire estimée du pool d'extraction d'un worker."""
+    return PDF_EXTRACT_PROCESSES * PDF_EXTRACT_PROCESS_RSS_MB if PDF_EXTRACT_PROCESSES > 1 else 0
+
+
 def extract_text_from_pdf(file_bytes):
-    text = ""
     with fitz.open(stream=file_bytes, filetype="pdf") as doc:
-        for page in doc:
-            text += page.get_text()
+        page_count = doc.page_count
+        if page_count < PARALLEL_PAGE_THRESHOLD or PDF_EXTRACT_PROCESSES < 2:
+            text = "".join(page.get_text() for page in doc)
+            return text.strip()
+
+    # Gros document : une plage de pages contiguë par processus, puis les
+    # morceaux sont recollés dans l'ordre des pages. Le PDF est écrit une
+    # seule fois dans un fichier temporaire au lieu d'être copié vers chaque
+    # processus.
+    pages_per_process = math.ceil(page_count / PDF_EXTRACT_PROCESSES)
+    ranges = [
+        (start, min(start + pages_per_process, page_count))
+        for start in range(0, page_count, pages_per_process)
+    ]
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf_file:
+        pdf_file.write(file_bytes)
+        pdf_file.flush()
+        chunks = _get_page_pool().map(
+            pdf_pages.extract_page_range,
+            [pdf_file.name] * len(ranges),
+            [start for start, _ in ranges],
+            [end for _, end in ranges],
+        )
+        text = "".join(chunks)
     return text.strip()
 
 # ---------------------------
@@ -397,51 +472,420 @@ def create_structured_summary(sections: Dict[str, str], text: str) -> Dict:
     
     return summary
 
+# ---------------------------
+# Pipeline d'analyse complet
+# ---------------------------
+def _no_stage(name: str):
+    pass
+
+
+def analyze_text(text: str, on_stage: Callable[[str], None] = _no_stage) -> Dict:
+    """Exécute le pipeline sur un texte déjà extrait.
+
+    `on_stage` est appelé avec le nom de chaque étape avant son exécution.
+    """
+    if not text or len(text) < 50:
+        return {"error": "Texte vide ou trop court pour être analysé."}
+    
+    # Nettoyer le texte
+    on_stage("clean_text")
+    text = clean_text(text)
+    
+    # Segmenter le CV
+    on_stage("segment_cv")
+    sections = segment_cv(text)
+    
+    # Extraire les informations de contact
+    on_stage("extract_contact_info")
+    contact_info = extract_contact_info(text)
+    
+    # Créer le résumé structuré
+    on_stage("create_structured_summary")
+    structured_summary = create_structured_summary(sections, text)
+    
+    # Extraire les compétences (déjà dans le summary mais on le garde pour compatibilité)
+    skills = structured_summary.get("competences", {})
+    
+    return {
+        "contact": contact_info,
+        "summary": structured_summary,
+        "skills": skills,
+        "sections_detected": list(sections.keys())
+    }
+
+
+def run_analysis(pdf_bytes: bytes, on_stage: Callable[[str], None] = _no_stage) -> Dict:
+    """Exécute le pipeline complet sur les octets d'un PDF."""
+    on_stage("extract_text_from_pdf")
+    text = extract_text_from_pdf(pdf_bytes)
+    
+    if not text or len(text) < 50:
+        return {"error": "PDF vide ou texte non extrait. Assurez-vous que le PDF contient du texte extractible."}
+    
+    return analyze_text(text, on_stage)
+
+
+def analysis_job(payload, is_text: bool = False, profile_id: Optional[str] = None,
+                 on_stage: Callable[[str], None] = _no_stage) -> Dict:
+    """Tâche exécutée par un worker : analyse d'un PDF ou d'un texte.
+
+    Avec `profile_id`, l'analyse est profilée et ses profils enregistrés sous cet identifiant.
+    """
+    pipeline = analyze_text if is_text else run_analysis
+    if profile_id is None:
+        return pipeline(payload, on_stage)
+    result, _ = profiling.profile_call(pipeline, payload, on_stage, profile_id=profile_id)
+    return result
+
+# ---------------------------
+# Pool de workers surveillés
+# ---------------------------
+worker_pool: Optional[WorkerPool] = None
+
+
+def _run_job_in_process(*args, **kwargs):
+    stage = ["startup"]
+
+    def on_stage(name: str):
+        stage[0] = name
+
+    try:
+        return analysis_job(*args, on_stage=on_stage, **kwargs)
+    except Exception as e:
+        raise AnalysisError(stage[0], str(e))
+
+
+async def run_job(*args, timeout_s: Optional[float] = None, **kwargs):
+    """Exécute `analysis_job` dans le pool, ou dans le processus si ANALYSIS_WORKERS=0.
+
+    `timeout_s` remplace le budget de temps du pool (sans effet hors pool).
+    Lève AnalysisError (ou BudgetExceeded) en indiquant l'étape en échec.
+    """
+    if worker_pool is None:
+        return _run_job_in_process(*args, **kwargs)
+    return await run_in_threadpool(worker_pool.run, *args, timeout_s=timeout_s, **kwargs)
+
+
+def analysis_error(e: AnalysisError) -> Dict:
+    """Erreur structurée renvoyée au client, avec l'étape en échec."""
+    if isinstance(e, BudgetExceeded):
+        return {"error": f"Analyse interrompue: {str(e)}", "stage": e.stage, "reason": e.reason}
+    return {"error": f"Erreur lors de l'analyse: {str(e)}", "stage": e.stage}
+
+# ---------------------------
+# Stockage des résultats et statistiques agrégées
+# ---------------------------
+cv_stats = stats.CVStats()
+# Nouveaux résultats enregistrés pendant une reconstruction (None hors reconstruction)
+_rebuild_pending: Optional[Dict[str, Dict]] = None
+
+
+def record_result(digest: str, result: Dict):
+    """Stocke un résultat réussi et l'intègre aux statistiques s'il est nouveau."""
+    if "error" in result:
+        return
+    if store.save(digest, result):
+        cv_stats.add(result)
+        cv_stats.maybe_save()
+        if _rebuild_pending is not None:
+            _rebuild_pending[digest] = result
+
+
+def _rebuild_from_store() -> Tuple[stats.CVStats, set]:
+    """Recalcule les agrégats depuis le stockage ; retourne aussi les empreintes lues."""
+    rebuilt = stats.CVStats()
+    seen = set()
+    for digest, result in store.iter_items():
+        if "error" not in result:
+            rebuilt.add(result)
+            seen.add(digest)
+    return rebuilt, seen
+
+# ---------------------------
+# Admission et ordonnancement par client
+# ---------------------------
+scheduler = admission.FairScheduler(max(ANALYSIS_WORKERS, 1))
+
+
+async def admit(
+    request: Request,
+    x_api_key: Optional[str] = Header(None),
+    x_priority: Optional[str] = Header(None),
+) -> admission.Tenant:
+    """Identifie le client et consomme un jeton de son quota."""
+    client_host = request.client.host if request.client else "unknown"
+    try:
+        tenant = admission.resolve_tenant(x_api_key, client_host, x_priority)
+    except admission.UnknownAPIKey:
+        raise HTTPException(status_code=401, detail="Clé d'API inconnue")
+    
+    retry_after = tenant.bucket.try_acquire()
+    if retry_after:
+        metrics.inc("cv_admission_rejected_total", tenant=tenant.name)
+        raise HTTPException(
+            status_code=429,
+            detail="Quota de requêtes dépassé",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    return tenant
+
+def _profile_links(request: Request, profile_id: str) -> Dict[str, str]:
+    return {
+        "pstats": str(request.url_for("get_profile", filename=f"{profile_id}.pstats")),
+        "speedscope": str(request.url_for("get_profile", filename=f"{profile_id}.speedscope.json")),
+    }
+
 # ---------------------------
 # Endpoint FastAPI
 # ---------------------------
 @app.post("/analyze-cv")
-async def analyze_cv(file: UploadFile = File(...)):
+async def analyze_cv(
+    request: Request,
+    file: UploadFile = File(...),
+    profile: bool = False,
+    x_admin_token: Optional[str] = Header(None),
+    tenant: admission.Tenant = Depends(admit),
+):
+    if profile and not admission.is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Jeton d'administration invalide pour ?profile=1")
+    
+    profile_id = None
     try:
         pdf_bytes = await file.read()
-        text = extract_text_from_pdf(pdf_bytes)
-        
-        if not text or len(text) < 50:
-            return {"error": "PDF vide ou texte non extrait. Assurez-vous que le PDF contient du texte extractible."}
-        
-        # Nettoyer le texte
-        text = clean_text(text)
-        
-        # Segmenter le CV
-        sections = segment_cv(text)
+        digest = store.sha256_hex(pdf_bytes)
         
-        # Extraire les informations de contact
-        contact_info = extract_contact_info(text)
-        
-        # Créer le résumé structuré
-        structured_summary = create_structured_summary(sections, text)
-        
-        # Extraire les compétences (déjà dans le summary mais on le garde pour compatibilité)
-        skills = structured_summary.get("competences", {})
+        # Un PDF déjà analysé n'est pas ré-analysé (sauf demande de profilage)
+        if profiling.should_profile(profile):
+            profile_id = profiling.new_profile_id()
+        else:
+            cached = store.load(digest)
+            if cached is not None:
+                return cached
         
-        return {
-            "contact": contact_info,
-            "summary": structured_summary,
-            "skills": skills,
-            "sections_detected": list(sections.keys())
-        }
+        async with scheduler.slot(tenant):
+            if profile_id:
+                # Budget élargi : le profilage ralentit l'analyse
+                result = await run_job(pdf_bytes, profile_id=profile_id,
+                                       timeout_s=ANALYSIS_TIMEOUT_S * profiling.PROFILE_TIMEOUT_FACTOR)
+            else:
+                result = await run_job(pdf_bytes)
+        record_result(digest, result)
+        if profile_id:
+            result["profile"] = _profile_links(request, profile_id)
+        return result
         
+    except AnalysisError as e:
+        error = analysis_error(e)
+        if profile_id:
+            # Profil partiel écrit avant l'arrêt du worker
+            error["profile"] = _profile_links(request, profile_id)
+        return error
     except Exception as e:
         return {"error": f"Erreur lors de l'analyse: {str(e)}"}
 
+@app.api_route("/analyses/{sha256}", methods=["GET", "HEAD"])
+async def get_analysis(sha256: str):
+    """Résultat déjà calculé pour le PDF d'empreinte `sha256`.
+
+    Les clients interrogent cette route avant d'envoyer un PDF à /analyze-cv,
+    et n'envoient le fichier qu'en cas de 404.
+    """
+    sha256 = sha256.lower()
+    if not store.is_sha256(sha256):
+        raise HTTPException(status_code=400, detail="Empreinte SHA-256 invalide")
+    result = store.load(sha256)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Analyse inconnue")
+    return result
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """Réponse en flux qui peut lire le corps de la requête pendant l'envoi.
+
+    StreamingResponse consomme les messages entrants pour détecter la
+    déconnexion du client, ce qui volerait le corps NDJSON encore en cours
+    de réception.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+
+async def _iter_lines(request: Request):
+    """Itère sur les lignes non vides du corps de la requête, au fil de la réception."""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+async def _analyze_text_record(tenant: admission.Tenant, text: str) -> Dict:
+    try:
+        digest = store.sha256_hex(text.encode("utf-8"))
+        cached = store.load(digest)
+        if cached is not None:
+            return cached
+        async with scheduler.slot(tenant):
+            result = await run_job(text, is_text=True)
+        record_result(digest, result)
+        return result
+    except AnalysisError as e:
+        return analysis_error(e)
+    except Exception as e:
+        return {"error": f"Erreur lors de l'analyse: {str(e)}"}
+
+
+async def _wait_for_token(tenant: admission.Tenant):
+    """Consomme un jeton du client, en attendant qu'il soit disponible.
+
+    Un flux NDJSON est ainsi ralenti au débit autorisé du client au lieu de
+    faire passer tous ses enregistrements pour un seul jeton.
+    """
+    retry_after = tenant.bucket.try_acquire()
+    if retry_after:
+        metrics.inc("cv_admission_throttled_total", tenant=tenant.name)
+    while retry_after:
+        await asyncio.sleep(retry_after)
+        retry_after = tenant.bucket.try_acquire()
+
+
+async def _analyze_ndjson_line(tenant: admission.Tenant, line: bytes, prepaid: List[bool]) -> str:
+    try:
+        record = json.loads(line)
+        record_id, text = record.get("id"), record.get("text")
+    except (ValueError, TypeError, AttributeError):
+        record_id, text = None, None
+    if not isinstance(text, str):
+        return json.dumps({"id": record_id, "error": "Enregistrement NDJSON invalide (attendu: {id, text})"},
+                          ensure_ascii=False) + "\n"
+    # Le premier enregistrement valide utilise le jeton déjà consommé par admit()
+    if prepaid:
+        prepaid.pop()
+    else:
+        await _wait_for_token(tenant)
+    result = await _analyze_text_record(tenant, text)
+    return json.dumps({"id": record_id, **result}, ensure_ascii=False) + "\n"
+
+
+async def _stream_ndjson(request: Request, tenant: admission.Tenant):
+    # Fenêtre d'enregistrements analysés en parallèle ; les résultats sont
+    # renvoyés dans l'ordre de réception.
+    window = 2 * max(ANALYSIS_WORKERS, 1)
+    pending = deque()
+    prepaid = [True]
+    try:
+        async for line in _iter_lines(request):
+            pending.append(asyncio.ensure_future(_analyze_ndjson_line(tenant, line, prepaid)))
+            if len(pending) >= window:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+@app.post("/analyze-text")
+async def analyze_text_endpoint(request: Request, tenant: admission.Tenant = Depends(admit)):
+    """Analyse un CV déjà converti en texte, sans passer par l'extraction PDF.
+
+    - `text/plain` : un seul CV, résultat JSON ;
+    - `application/x-ndjson` : un enregistrement `{"id", "text"}` par ligne,
+      résultats renvoyés en NDJSON au fil de l'eau. Chaque enregistrement
+      consomme un jeton du quota du client ; le flux attend si le quota est
+      épuisé.
+
+    Un flux sans clé d'API est donc limité à RATE_LIMIT_PER_S CV/s : les
+    intégrations ATS doivent avoir leur propre clé (API_KEYS) avec un débit
+    à la mesure de leur volume.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return _DuplexStreamingResponse(_stream_ndjson(request, tenant), media_type="application/x-ndjson")
+    
+    text = (await request.body()).decode("utf-8", errors="replace")
+    return await _analyze_text_record(tenant, text)
+
+@app.get("/stats")
+async def get_stats(top: int = 20):
+    """Agrégats sur les CV analysés, maintenus à chaque nouvelle analyse."""
+    return cv_stats.snapshot(top)
+
+@app.post("/stats/rebuild")
+async def rebuild_stats(x_admin_token: Optional[str] = Header(None)):
+    """Recalcule les agrégats à partir de tous les résultats stockés.
+
+    Les analyses continuent pendant la reconstruction : les résultats
+    enregistrés entre-temps et absents du parcours du stockage y sont
+    rejoués avant de remplacer les agrégats courants.
+    """
+    global cv_stats, _rebuild_pending
+    if not admission.is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Jeton d'administration invalide")
+    if _rebuild_pending is not None:
+        raise HTTPException(status_code=409, detail="Reconstruction déjà en cours")
+    _rebuild_pending = {}
+    try:
+        rebuilt, seen = await run_in_threadpool(_rebuild_from_store)
+        # record_result s'exécute sur la boucle : rien ne peut s'intercaler
+        # entre le rejeu et le remplacement
+        for digest, result in _rebuild_pending.items():
+            if digest not in seen:
+                rebuilt.add(result)
+        cv_stats = rebuilt
+    finally:
+        _rebuild_pending = None
+    cv_stats.save()
+    return {"documents": cv_stats.documents}
+
+@app.get("/profiles/{filename}")
+async def get_profile(filename: str, x_admin_token: Optional[str] = Header(None)):
+    if not admission.is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Jeton d'administration invalide")
+    path = profiling.profile_path(filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profil introuvable")
+    return FileResponse(path)
+
 @app.get("/")
 async def root():
-    return {"message": "CV Analyzer API is running", "version": "2.0"}
+    return {"message": "CV Analyzer API is running", "version": "2.0", "analyzer_version": store.ANALYZER_VERSION}
 
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.on_event("startup")
+async def startup():
+    global worker_pool, cv_stats
+    cv_stats = stats.CVStats.load()
+    if ANALYSIS_WORKERS > 0:
+        # Les processus d'extraction parallèle vivent dans le groupe du worker :
+        # leur empreinte ne doit déclencher ni recyclage ni dépassement de budget
+        page_pool_mb = _page_pool_rss_mb()
+        worker_pool = WorkerPool(
+            analysis_job,
+            max_rss_mb=ANALYSIS_MAX_RSS_MB + page_pool_mb,
+            recycle_rss_mb=WORKER_RECYCLE_RSS_MB + page_pool_mb,
+        )
+        worker_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    cv_stats.save()
+    if worker_pool is not None:
+        worker_pool.shutdown()
+    if _page_pool is not None:
+        _page_pool.shutdown(cancel_futures=True)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
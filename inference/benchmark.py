@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de performance pour l'API d'analyse de CV
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List
+
+import fitz
+
+LOREM = (
+    "Full-Stack Developer Intern - HumanTech Solutions, Casablanca. "
+    "Development of an intelligent recruitment platform based on microservices "
+    "with Python, React, Node.js, Docker, Kubernetes and PostgreSQL. "
+)
+
+
+def make_pdf(page_count: int, label: str = "") -> bytes:
+    """Génère un PDF synthétique de `page_count` pages de texte (`label` le rend unique)."""
+    doc = fitz.open()
+    for i in range(page_count):
+        page = doc.new_page()
+        page.insert_textbox(
+            fitz.Rect(36, 36, 559, 806),
+            f"Page {i + 1} {label}\n" + LOREM * 20,
+            fontsize=9,
+        )
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
+def best_of(fn, repeat: int) -> float:
+    """Retourne le meilleur temps (en secondes) sur `repeat` exécutions."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def bench_pages(args):
+    """Compare l'extraction séquentielle et parallèle selon le nombre de pages."""
+    # Import local : les processus "spawn" réimportent ce script comme module
+    # principal, et ne doivent pas charger tout le service
+    import app
+
+    if args.processes:
+        app.PDF_EXTRACT_PROCESSES = args.processes
+    print(f"🧪 Extraction PDF : {app.PDF_EXTRACT_PROCESSES} processus (cpu_count={os.cpu_count()})")
+    if app.PDF_EXTRACT_PROCESSES < 2:
+        print("⚠️ Un seul processus : l'extraction reste séquentielle (--processes N pour comparer)")
+    print(f"{'pages':>8} {'séquentiel (s)':>16} {'parallèle (s)':>16} {'speedup':>9}")
+
+    # Préchauffer le pool pour ne pas mesurer le démarrage des processus
+    list(app._get_page_pool().map(time.sleep, [0.5] * app.PDF_EXTRACT_PROCESSES))
+
+    for page_count in args.pages:
+        pdf_bytes = make_pdf(page_count)
+
+        app.PARALLEL_PAGE_THRESHOLD = page_count + 1
+        sequential = best_of(lambda: app.extract_text_from_pdf(pdf_bytes), args.repeat)
+
+        app.PARALLEL_PAGE_THRESHOLD = 0
+        parallel = best_of(lambda: app.extract_text_from_pdf(pdf_bytes), args.repeat)
+
+        print(f"{page_count:>8} {sequential:>16.3f} {parallel:>16.3f} {sequential / parallel:>8.2f}x")
+
+    # Empreinte réelle des processus d'extraction, à reporter dans PDF_EXTRACT_PROCESS_RSS_MB
+    rss = [_rss_mb(pid) for pid in app._page_pool._processes]
+    print(f"RSS des processus d'extraction : max {max(rss):.0f} Mo, total {sum(rss):.0f} Mo"
+          f" (PDF_EXTRACT_PROCESS_RSS_MB={app.PDF_EXTRACT_PROCESS_RSS_MB})")
+    app._page_pool.shutdown()
+
+
+CITIES = ["Casablanca", "Rabat", "Marrakech", "Fès", "Tanger", "Agadir", "Paris", "Lyon", "Montréal", "Bruxelles"]
+WORDS = (
+    "développement conception plateforme microservices recrutement analyse données "
+    "déploiement automatisation tests intégration continue supervision performance "
+    "application mobile web api sécurité réseau infrastructure cloud migration "
+    "optimisation modélisation tableau de bord client équipe agile encadrement"
+).split()
+
+
+def _sentence(rng, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def make_result(rng, skills_by_category: Dict[str, List[str]], i: int) -> Dict:
+    """Génère un résultat d'analyse synthétique, différent pour chaque `i`."""
+    competences = {}
+    for category, skills in skills_by_category.items():
+        picked = rng.sample(skills, rng.randint(0, min(5, len(skills))))
+        if picked:
+            competences[category] = [skill.title() for skill in picked]
+    summary = {
+        "profil": " ".join(_sentence(rng, rng.randint(8, 20)) for _ in range(rng.randint(1, 4))),
+        "formation": [
+            {"annee": str(rng.randint(1995, 2025)), "diplome": _sentence(rng, rng.randint(4, 10))}
+            for _ in range(rng.randint(1, 3))
+        ],
+        "experiences": [
+            {"poste": _sentence(rng, rng.randint(3, 8)), "periode": f"{rng.randint(2010, 2025)}",
+             "description": _sentence(rng, rng.randint(10, 40))}
+            for _ in range(rng.randint(0, 5))
+        ],
+        "competences": competences,
+        "projets": [
+            {"titre": _sentence(rng, rng.randint(3, 8)), "description": _sentence(rng, rng.randint(10, 30))}
+            for _ in range(rng.randint(0, 4))
+        ],
+    }
+    return {
+        "contact": {
+            "nom": f"Candidat {i}",
+            "email": f"candidat.{i}.{rng.randrange(10**6)}@example.com",
+            "telephone": f"+212 6{rng.randrange(10**8):08d}",
+            "localisation": rng.choice(CITIES),
+        },
+        "summary": summary,
+        "skills": competences,
+        "sections_detected": rng.sample(["PROFIL", "FORMATION", "EXPERIENCE", "COMPETENCES", "PROJETS",
+                                         "LANGUES", "CERTIFICATIONS"], rng.randint(2, 7)),
+    }
+
+
+def bench_parquet(args):
+    """Compare taille et temps de chargement pandas d'un corpus en JSONL et en Parquet."""
+    import pandas as pd
+    import pyarrow.parquet as pq
+    from export_parquet import ParquetExporter, iter_results
+
+    import app
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl_path = Path(tmp) / "corpus.jsonl"
+        parquet_dir = Path(tmp) / "corpus_parquet"
+
+        with open(jsonl_path, "w", encoding="utf-8") as f:
+            for i in range(args.count):
+                result = make_result(rng, app.TECHNICAL_SKILLS, i)
+                f.write(json.dumps({"id": f"cv-{i}", **result}, ensure_ascii=False) + "\n")
+
+        start = time.perf_counter()
+        with ParquetExporter(str(parquet_dir)) as exporter:
+            for cv_id, result in iter_results(str(jsonl_path)):
+                exporter.add(cv_id, result)
+        export_time = time.perf_counter() - start
+
+        jsonl_size = jsonl_path.stat().st_size
+        parquet_size = sum(p.stat().st_size for p in parquet_dir.rglob("*.parquet"))
+
+        # Chargement actuel de l'équipe analytics : le JSONL lu dans pandas
+        jsonl_load = best_of(lambda: pd.read_json(jsonl_path, lines=True), args.repeat)
+        parquet_load = best_of(lambda: pd.read_parquet(parquet_dir), args.repeat)
+        arrow_load = best_of(lambda: pq.read_table(parquet_dir), args.repeat)
+
+        print(f"🧪 Corpus de {args.count} CV distincts (export Parquet en {export_time:.2f}s)")
+        print(f"{'format':>18} {'taille (Mo)':>12} {'chargement (s)':>16}")
+        print(f"{'jsonl -> pandas':>18} {jsonl_size / 1e6:>12.2f} {jsonl_load:>16.3f}")
+        print(f"{'parquet -> pandas':>18} {parquet_size / 1e6:>12.2f} {parquet_load:>16.3f}")
+        print(f"{'parquet -> arrow':>18} {parquet_size / 1e6:>12.2f} {arrow_load:>16.3f}")
+
+
+def bench_text(args):
+    """Compare le débit (CV/s) de /analyze-cv et du flux NDJSON de /analyze-text.
+
+    Mesure faite contre un service lancé (pool de workers, admission et
+    ordonnancement compris). Chaque CV est unique pour ne pas être servi
+    depuis le stockage des résultats.
+    """
+    import requests
+    from concurrent.futures import ThreadPoolExecutor
+
+    headers = {"X-API-Key": args.api_key} if args.api_key else {}
+    if not args.api_key:
+        print("⚠️ Sans clé d'API, le débit est borné par RATE_LIMIT_PER_S du service (--api-key)")
+    run_id = uuid.uuid4().hex[:8]
+    pdfs = [make_pdf(args.pages, f"{run_id}-{i}") for i in range(args.count)]
+    texts = []
+    for pdf_bytes in pdfs:
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            texts.append("".join(page.get_text() for page in doc))
+
+    def post_pdf(pdf_bytes: bytes) -> bool:
+        response = requests.post(f"{args.url}/analyze-cv", headers=headers, timeout=120,
+                                 files={"file": ("cv.pdf", pdf_bytes, "application/pdf")})
+        return response.status_code == 200 and "error" not in response.json()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        pdf_ok = sum(executor.map(post_pdf, pdfs))
+    pdf_time = time.perf_counter() - start
+
+    body = "".join(
+        json.dumps({"id": i, "text": text}, ensure_ascii=False) + "\n"
+        for i, text in enumerate(texts)
+    ).encode("utf-8")
+    start = time.perf_counter()
+    response = requests.post(f"{args.url}/analyze-text", data=body, stream=True, timeout=600,
+                             headers={**headers, "Content-Type": "application/x-ndjson"})
+    text_ok = sum("error" not in json.loads(line) for line in response.iter_lines() if line)
+    text_time = time.perf_counter() - start
+
+    print(f"🧪 {args.count} CV de {args.pages} page(s) via {args.url}")
+    print(f"{'endpoint':>28} {'CV/s':>8} {'réussis':>8}")
+    print(f"{'/analyze-cv (' + str(args.concurrency) + ' clients)':>28} {args.count / pdf_time:>8.1f} {pdf_ok:>8}")
+    print(f"{'/analyze-text (NDJSON)':>28} {args.count / text_time:>8.1f} {text_ok:>8}")
+    print(f"Gain : {pdf_time / text_time:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pages = subparsers.add_parser("pages", help="Extraction PDF séquentielle vs parallèle")
+    pages.add_argument("--pages", type=int, nargs="+", default=[8, 32, 64, 128, 256, 512])
+    pages.add_argument("--processes", type=int, default=0,
+                       help="Processus d'extraction (défaut : PDF_EXTRACT_PROCESSES)")
+    pages.add_argument("--repeat", type=int, default=3)
+    pages.set_defaults(func=bench_pages)
+
+    parquet = subparsers.add_parser("parquet", help="Taille et chargement pandas JSONL vs Parquet")
+    parquet.add_argument("--count", type=int, default=100_000)
+    parquet.add_argument("--seed", type=int, default=0)
+    parquet.add_argument("--repeat", type=int, default=3)
+    parquet.set_defaults(func=bench_parquet)
+
+    text = subparsers.add_parser("text", help="Débit de /analyze-cv vs /analyze-text (NDJSON)")
+    text.add_argument("--url", default=os.getenv("BACKEND_URL", "http://127.0.0.1:8000"))
+    text.add_argument("--api-key", default=os.getenv("API_KEY"), help="Clé d'API du client (X-API-Key)")
+    text.add_argument("--count", type=int, default=200)
+    text.add_argument("--pages", type=int, default=2)
+    text.add_argument("--concurrency", type=int, default=4, help="Clients /analyze-cv simultanés")
+    text.set_defaults(func=bench_text)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
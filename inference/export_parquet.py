@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Export colonnaire (Arrow/Parquet) des résultats d'analyse de CV
+
+Usage :
+    python export_parquet.py resultats.jsonl autres/*.json --output corpus_parquet
+    python export_parquet.py --from-store --output corpus_parquet
+    cat resultats.jsonl | python export_parquet.py - --output corpus_parquet
+    curl -s -H "Content-Type: application/x-ndjson" --data-binary @cvs.ndjson \
+        http://127.0.0.1:8000/analyze-text | python export_parquet.py - -o corpus_parquet
+"""
+
+import argparse
+import datetime
+import json
+import sys
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import store
+
+# ---------------------------
+# Schéma Arrow du corpus
+# ---------------------------
+# Les chaînes très répétées (catégories, compétences, villes, sections) sont
+# encodées en dictionnaire pour réduire la taille et accélérer le chargement.
+DICT_STRING = pa.dictionary(pa.int32(), pa.string())
+
+SKILL_TYPE = pa.struct([
+    ("category", DICT_STRING),
+    ("name", DICT_STRING),
+])
+FORMATION_TYPE = pa.struct([
+    ("diplome", pa.string()),
+    ("etablissement", pa.string()),
+    ("annee", pa.int16()),
+])
+EXPERIENCE_TYPE = pa.struct([
+    ("poste", pa.string()),
+    ("periode", pa.string()),
+    ("description", pa.string()),
+])
+PROJET_TYPE = pa.struct([
+    ("titre", pa.string()),
+    ("periode", pa.string()),
+    ("description", pa.string()),
+])
+
+CV_SCHEMA = pa.schema([
+    ("cv_id", pa.string()),
+    ("nom", pa.string()),
+    ("email", pa.string()),
+    ("telephone", pa.string()),
+    ("linkedin", pa.string()),
+    ("localisation", DICT_STRING),
+    ("profil", pa.string()),
+    ("sections_detected", pa.list_(DICT_STRING)),
+    ("skills", pa.list_(SKILL_TYPE)),
+    ("formation", pa.list_(FORMATION_TYPE)),
+    ("experiences", pa.list_(EXPERIENCE_TYPE)),
+    ("projets", pa.list_(PROJET_TYPE)),
+    ("langues", pa.list_(pa.string())),
+    ("certifications", pa.list_(pa.string())),
+])
+
+
+def _to_year(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def flatten_result(cv_id: str, result: Dict) -> Dict:
+    """Aplatit un résultat de /analyze-cv en une ligne conforme à CV_SCHEMA."""
+    contact = result.get("contact") or {}
+    summary = result.get("summary") or {}
+    competences = summary.get("competences") or result.get("skills") or {}
+
+    return {
+        "cv_id": cv_id,
+        "nom": contact.get("nom"),
+        "email": contact.get("email"),
+        "telephone": contact.get("telephone"),
+        "linkedin": contact.get("linkedin"),
+        "localisation": contact.get("localisation"),
+        "profil": summary.get("profil"),
+        "sections_detected": result.get("sections_detected") or [],
+        "skills": [
+            {"category": category, "name": skill}
+            for category, skills in competences.items()
+            for skill in skills
+        ],
+        "formation": [
+            {
+                "diplome": f.get("diplome"),
+                "etablissement": f.get("etablissement"),
+                "annee": _to_year(f.get("annee")),
+            }
+            for f in summary.get("formation") or []
+            if isinstance(f, dict)
+        ],
+        "experiences": [
+            {k: e.get(k) for k in ("poste", "periode", "description")}
+            for e in summary.get("experiences") or []
+            if isinstance(e, dict)
+        ],
+        "projets": [
+            {k: p.get(k) for k in ("titre", "periode", "description")}
+            for p in summary.get("projets") or []
+            if isinstance(p, dict)
+        ],
+        "langues": summary.get("langues") or [],
+        "certifications": summary.get("certifications") or [],
+    }
+
+
+# ---------------------------
+# Écriture Parquet partitionnée et incrémentale
+# ---------------------------
+class ParquetExporter:
+    """Écrit des résultats d'analyse en Parquet par lots, en mémoire bornée.
+
+    Les lignes sont accumulées jusqu'à `batch_size` puis écrites comme un
+    row group ; un nouveau fichier est ouvert tous les `rows_per_file`.
+    Les fichiers sont rangés dans une partition Hive `ingest_date=AAAA-MM-JJ`.
+    """
+
+    def __init__(self, output_dir: str, batch_size: int = 10_000,
+                 rows_per_file: int = 1_000_000, ingest_date: Optional[str] = None):
+        ingest_date = ingest_date or datetime.date.today().isoformat()
+        self.partition_dir = Path(output_dir) / f"ingest_date={ingest_date}"
+        self.partition_dir.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.rows_per_file = rows_per_file
+        self.rows_written = 0
+        self.skipped = 0
+        self._prefix = uuid.uuid4().hex[:8]
+        self._buffer: List[Dict] = []
+        self._writer: Optional[pq.ParquetWriter] = None
+        self._file_index = 0
+        self._file_rows = 0
+
+    def add(self, cv_id: str, result: Dict):
+        if "error" in result:
+            self.skipped += 1
+            return
+        self._buffer.append(flatten_result(cv_id, result))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        if self._writer is None:
+            path = self.partition_dir / f"part-{self._prefix}-{self._file_index:05d}.parquet"
+            self._writer = pq.ParquetWriter(path, CV_SCHEMA, compression="zstd")
+        batch = pa.RecordBatch.from_pylist(self._buffer, schema=CV_SCHEMA)
+        self._writer.write_batch(batch)
+        self.rows_written += batch.num_rows
+        self._file_rows += batch.num_rows
+        self._buffer = []
+        if self._file_rows >= self.rows_per_file:
+            self._close_writer()
+
+    def _close_writer(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._file_index += 1
+            self._file_rows = 0
+
+    def close(self):
+        self.flush()
+        self._close_writer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ---------------------------
+# Lecture des résultats JSON / JSONL
+# ---------------------------
+def iter_results(source: str) -> Iterator[Tuple[str, Dict]]:
+    """Itère sur (cv_id, résultat) depuis un fichier .json, .jsonl ou '-' (stdin).
+
+    Le JSONL est lu ligne par ligne ; un champ "id" est utilisé comme cv_id
+    s'il est présent, sinon l'identifiant est dérivé de la source et de la ligne.
+    """
+    if source != "-" and not source.endswith((".jsonl", ".ndjson")):
+        with open(source, encoding="utf-8") as f:
+            data = json.load(f)
+        records = data if isinstance(data, list) else [data]
+        for i, record in enumerate(records):
+            yield str(record.get("id", f"{source}:{i}")), record
+        return
+
+    stream = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    try:
+        for line_no, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            yield str(record.get("id", f"{source}:{line_no}")), record
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def export(sources: Iterable[str], exporter: ParquetExporter):
+    for source in sources:
+        for cv_id, result in iter_results(source):
+            exporter.add(cv_id, result)
+
+
+def export_store(exporter: ParquetExporter):
+    """Exporte les résultats stockés par le service, avec leur empreinte SHA-256 comme cv_id."""
+    for digest, result in store.iter_items():
+        exporter.add(digest, result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="*", help="Fichiers .json/.jsonl, ou '-' pour stdin")
+    parser.add_argument("--from-store", action="store_true",
+                        help=f"Exporte aussi les résultats stockés dans {store.RESULTS_DIR}")
+    parser.add_argument("--output", "-o", required=True, help="Répertoire du dataset Parquet")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--rows-per-file", type=int, default=1_000_000)
+    args = parser.parse_args()
+    if not args.sources and not args.from_store:
+        parser.error("indiquer au moins une source ou --from-store")
+
+    with ParquetExporter(args.output, args.batch_size, args.rows_per_file) as exporter:
+        export(args.sources, exporter)
+        if args.from_store:
+            export_store(exporter)
+
+    print(f"💾 {exporter.rows_written} CV exportés dans {exporter.partition_dir}"
+          f" ({exporter.skipped} résultats en erreur ignorés)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Métriques de service au format texte Prometheus (exposées sur /metrics)
+"""
+
+import threading
+from typing import Dict, Tuple
+
+_lock = threading.Lock()
+_help: Dict[str, Tuple[str, str]] = {}
+_values: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+
+def describe(name: str, metric_type: str, help_text: str):
+    """Déclare une métrique (type Prometheus : counter ou summary)."""
+    _help[name] = (metric_type, help_text)
+
+
+def _key(name: str, labels: Dict[str, str]):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels):
+    """Incrémente un compteur."""
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = _values.get(key, 0) + value
+
+
+def observe(name: str, value: float, **labels):
+    """Ajoute une observation à un summary (séries _sum et _count)."""
+    sum_key = _key(f"{name}_sum", labels)
+    count_key = _key(f"{name}_count", labels)
+    with _lock:
+        _values[sum_key] = _values.get(sum_key, 0) + value
+        _values[count_key] = _values.get(count_key, 0) + 1
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def render() -> str:
+    """Sérialise toutes les métriques au format d'exposition Prometheus."""
+    with _lock:
+        values = sorted(_values.items())
+
+    lines = []
+    for name, (metric_type, help_text) in sorted(_help.items()):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for (series, labels), value in values:
+            if series == name or (metric_type == "summary" and series in (f"{name}_sum", f"{name}_count")):
+                lines.append(f"{series}{_format_labels(labels)} {value:g}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,18 @@
+"""
+Extraction de texte d'une plage de pages PDF, exécutée dans les processus
+d'extraction parallèle
+
+Ce module n'importe que fitz : les processus "spawn" qui le chargent restent
+légers (le service complet n'y est pas importé), car ils vivent dans le groupe
+de processus du worker d'analyse et comptent dans ses budgets mémoire.
+"""
+
+import fitz
+
+
+def extract_page_range(pdf_path: str, start: int, end: int) -> str:
+    """Extrait le texte des pages [start, end[ avec un document fitz propre au processus."""
+    # Les documents fitz ne peuvent pas être partagés entre threads/processus :
+    # chaque tâche ouvre donc son propre handle sur le fichier PDF.
+    with fitz.open(pdf_path) as doc:
+        return "".join(doc[i].get_text() for i in range(start, end))
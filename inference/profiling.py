@@ -0,0 +1,194 @@
+"""
+Profilage à la demande du pipeline d'analyse
+
+Chaque exécution profilée produit deux fichiers dans PROFILE_DIR :
+- `<id>.pstats` : profil cProfile (lisible avec pstats, snakeviz...)
+- `<id>.speedscope.json` : échantillons de piles au format speedscope
+  (https://www.speedscope.app), affichable en flamegraph
+
+Les deux fichiers sont réécrits toutes les PROFILE_FLUSH_INTERVAL_S secondes
+pendant l'analyse : si le worker est tué pour dépassement de budget, le profil
+partiel (jusqu'à la dernière écriture) reste disponible.
+"""
+
+import cProfile
+import json
+import marshal
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Proportion de requêtes profilées automatiquement (0 = jamais)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Intervalle d'échantillonnage des piles, en secondes
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.001"))
+# Nombre de profils conservés dans PROFILE_DIR (les plus anciens sont supprimés)
+PROFILE_MAX_PROFILES = int(os.getenv("PROFILE_MAX_PROFILES", "200"))
+# Intervalle d'écriture des profils partiels pendant l'analyse, en secondes
+PROFILE_FLUSH_INTERVAL_S = float(os.getenv("PROFILE_FLUSH_INTERVAL_S", "2"))
+# Budget de temps d'une analyse profilée, en multiple de ANALYSIS_TIMEOUT_S
+# (cProfile et l'échantillonnage ralentissent l'analyse)
+PROFILE_TIMEOUT_FACTOR = float(os.getenv("PROFILE_TIMEOUT_FACTOR", "3"))
+
+_PROFILE_SUFFIXES = (".pstats", ".speedscope.json")
+
+
+def should_profile(requested: bool) -> bool:
+    """Décide si la requête courante doit être profilée.
+
+    `requested` indique une demande explicite, déjà autorisée par l'appelant.
+    """
+    return requested or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+
+
+class StackSampler(threading.Thread):
+    """Échantillonne périodiquement la pile d'un thread cible."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames: List[Dict] = []
+        self.frame_index: Dict[Tuple[str, str, int], int] = {}
+        self.samples: List[List[int]] = []
+        self.weights: List[float] = []
+        self._stop_event = threading.Event()
+
+    def _frame_id(self, frame) -> int:
+        code = frame.f_code
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        if key not in self.frame_index:
+            self.frame_index[key] = len(self.frames)
+            self.frames.append({"name": key[0], "file": key[1], "line": key[2]})
+        return self.frame_index[key]
+
+    def run(self):
+        last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_id(frame))
+                frame = frame.f_back
+            # speedscope attend les piles de la racine vers la feuille
+            stack.reverse()
+            self.samples.append(stack)
+            self.weights.append(now - last)
+            last = now
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def to_speedscope(self, name: str) -> Dict:
+        # Copie cohérente : le thread d'échantillonnage peut encore ajouter des piles
+        count = len(self.weights)
+        samples, weights = self.samples[:count], self.weights[:count]
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "cv-analyzer",
+            "shared": {"frames": list(self.frames)},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+
+def new_profile_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def _write_atomic(path: str, mode: str, write: Callable):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _write_profiles(profile_id: str, profiler: cProfile.Profile, sampler: StackSampler):
+    """Écrit les deux fichiers du profil ; possible pendant que le profilage est actif."""
+    # Équivalent de dump_stats sans désactiver le profileur (seuls les appels
+    # terminés figurent dans un profil partiel)
+    profiler.snapshot_stats()
+    _write_atomic(os.path.join(PROFILE_DIR, f"{profile_id}.pstats"), "wb",
+                  lambda f: marshal.dump(profiler.stats, f))
+    _write_atomic(os.path.join(PROFILE_DIR, f"{profile_id}.speedscope.json"), "w",
+                  lambda f: json.dump(sampler.to_speedscope(profile_id), f))
+
+
+def profile_call(fn: Callable, *args, profile_id: Optional[str] = None, **kwargs) -> Tuple[object, str]:
+    """Exécute `fn` sous cProfile et échantillonnage, et enregistre les profils.
+
+    Retourne le résultat de `fn` et l'identifiant du profil.
+    """
+    profile_id = profile_id or new_profile_id()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+
+    sampler = StackSampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL)
+    profiler = cProfile.Profile()
+    done = threading.Event()
+
+    def flush_periodically():
+        while not done.wait(PROFILE_FLUSH_INTERVAL_S):
+            _write_profiles(profile_id, profiler, sampler)
+
+    flusher = threading.Thread(target=flush_periodically, daemon=True)
+    sampler.start()
+    flusher.start()
+    profiler.enable()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        profiler.disable()
+        done.set()
+        flusher.join()
+        sampler.stop()
+        _write_profiles(profile_id, profiler, sampler)
+        _prune_profiles()
+    return result, profile_id
+
+
+def _prune_profiles():
+    """Ne garde que les PROFILE_MAX_PROFILES profils les plus récents."""
+    try:
+        entries = [
+            entry for entry in os.scandir(PROFILE_DIR)
+            if entry.is_file() and entry.name.endswith(_PROFILE_SUFFIXES)
+        ]
+    except OSError:
+        return
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    # Deux fichiers par profil
+    for entry in entries[2 * PROFILE_MAX_PROFILES:]:
+        try:
+            os.unlink(entry.path)
+        except OSError:
+            pass
+
+
+def profile_path(filename: str) -> Optional[str]:
+    """Retourne le chemin d'un fichier de profil existant, ou None."""
+    if os.path.basename(filename) != filename or not filename.endswith(_PROFILE_SUFFIXES):
+        return None
+    path = os.path.join(PROFILE_DIR, filename)
+    return path if os.path.isfile(path) else None
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Statistiques agrégées sur les CV analysés, maintenues de façon incrémentale
+
+Chaque nouvelle analyse met à jour des compteurs (compétences par catégorie,
+localisations, années de diplôme) et une matrice creuse de co-occurrence des
+compétences. Les agrégats sont persistés dans STATS_PATH.
+
+Reconstruction complète depuis les résultats stockés (en cas de dérive),
+par le service en cours d'exécution (jeton ADMIN_TOKEN requis) :
+    ADMIN_TOKEN=... python stats.py rebuild --url http://127.0.0.1:8000
+
+Hors ligne, directement sur STATS_PATH : le service doit être arrêté, sinon il
+écrase le fichier avec ses agrégats en mémoire au prochain enregistrement.
+    python stats.py rebuild --offline
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import os
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable
+
+import requests
+
+import store
+
+STATS_PATH = os.getenv("STATS_PATH", "stats.json")
+# Délai minimal entre deux écritures de STATS_PATH, en secondes
+STATS_FLUSH_INTERVAL_S = float(os.getenv("STATS_FLUSH_INTERVAL_S", "5"))
+
+# Séparateur des paires dans la matrice de co-occurrence sérialisée
+_PAIR_SEP = "\t"
+
+
+class CVStats:
+    """Agrégats incrémentaux sur les résultats d'analyse."""
+
+    def __init__(self):
+        self.documents = 0
+        self.skills: Dict[str, Counter] = defaultdict(Counter)
+        # Matrice creuse : seules les paires (a, b) avec a < b observées sont stockées
+        self.cooccurrence: Counter = Counter()
+        self.localisations: Counter = Counter()
+        self.degree_years: Counter = Counter()
+        self._last_save = 0.0
+
+    def add(self, result: Dict):
+        """Intègre le résultat d'une analyse réussie."""
+        self.documents += 1
+
+        competences = (result.get("summary") or {}).get("competences") or result.get("skills") or {}
+        names = set()
+        for category, skills in competences.items():
+            self.skills[category].update(skills)
+            names.update(skills)
+        self.cooccurrence.update(itertools.combinations(sorted(names), 2))
+
+        localisation = (result.get("contact") or {}).get("localisation")
+        if localisation:
+            self.localisations[localisation.title()] += 1
+
+        for formation in (result.get("summary") or {}).get("formation") or []:
+            if isinstance(formation, dict) and formation.get("annee"):
+                self.degree_years[str(formation["annee"])] += 1
+
+    def snapshot(self, top: int = 20) -> Dict:
+        """Vue résumée des agrégats (les `top` premières entrées de chaque compteur)."""
+        return {
+            "documents": self.documents,
+            "skills_by_category": {
+                category: counter.most_common(top)
+                for category, counter in sorted(self.skills.items())
+            },
+            "cooccurrence": [
+                [a, b, count]
+                for (a, b), count in heapq.nlargest(top, self.cooccurrence.items(), key=lambda item: item[1])
+            ],
+            "localisations": self.localisations.most_common(top),
+            "degree_years": dict(sorted(self.degree_years.items())),
+        }
+
+    # ---------------------------
+    # Persistance
+    # ---------------------------
+    def to_dict(self) -> Dict:
+        return {
+            "documents": self.documents,
+            "skills": {category: dict(counter) for category, counter in self.skills.items()},
+            "cooccurrence": {_PAIR_SEP.join(pair): count for pair, count in self.cooccurrence.items()},
+            "localisations": dict(self.localisations),
+            "degree_years": dict(self.degree_years),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CVStats":
+        stats = cls()
+        stats.documents = data.get("documents", 0)
+        for category, counts in data.get("skills", {}).items():
+            stats.skills[category] = Counter(counts)
+        stats.cooccurrence = Counter({
+            tuple(pair.split(_PAIR_SEP, 1)): count
+            for pair, count in data.get("cooccurrence", {}).items()
+        })
+        stats.localisations = Counter(data.get("localisations", {}))
+        stats.degree_years = Counter(data.get("degree_years", {}))
+        return stats
+
+    @classmethod
+    def load(cls, path: str = STATS_PATH) -> "CVStats":
+        try:
+            with open(path, encoding="utf-8") as f:
+                return cls.from_dict(json.load(f))
+        except (OSError, ValueError):
+            return cls()
+
+    def save(self, path: str = STATS_PATH):
+        """Écrit les agrégats de façon atomique."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._last_save = time.monotonic()
+
+    def maybe_save(self, path: str = STATS_PATH):
+        """Écrit les agrégats si le dernier enregistrement date de plus de STATS_FLUSH_INTERVAL_S."""
+        if time.monotonic() - self._last_save >= STATS_FLUSH_INTERVAL_S:
+            self.save(path)
+
+
+def rebuild(results: Iterable[Dict]) -> CVStats:
+    """Recalcule les agrégats à partir de résultats d'analyse."""
+    stats = CVStats()
+    for result in results:
+        if "error" not in result:
+            stats.add(result)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = subparsers.add_parser("rebuild", help=f"Recalcule les statistiques depuis {store.RESULTS_DIR}")
+    rebuild_parser.add_argument("--url", default=os.getenv("BACKEND_URL", "http://127.0.0.1:8000"),
+                                help="Adresse du service (POST /stats/rebuild)")
+    rebuild_parser.add_argument("--offline", action="store_true",
+                                help=f"Réécrit {STATS_PATH} directement (service arrêté)")
+    args = parser.parse_args()
+
+    if args.offline:
+        stats = rebuild(store.iter_results())
+        stats.save()
+        print(f"📊 Statistiques reconstruites : {stats.documents} CV -> {STATS_PATH}")
+        return
+
+    response = requests.post(
+        f"{args.url}/stats/rebuild",
+        headers={"X-Admin-Token": os.getenv("ADMIN_TOKEN", "")},
+        timeout=600,
+    )
+    if response.status_code != 200:
+        raise SystemExit(f"❌ Reconstruction refusée ({response.status_code}) : {response.text}")
+    print(f"📊 Statistiques reconstruites par le service : {response.json()['documents']} CV")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Stockage local des résultats d'analyse, indexés par empreinte SHA-256 du PDF
+
+Les résultats sont rangés dans
+RESULTS_DIR/v<ANALYZER_VERSION>/<2 premiers caractères>/<sha256>.json :
+le préfixe de version invalide les résultats calculés par une ancienne version
+des extracteurs, et le découpage évite des répertoires trop volumineux.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+from typing import Dict, Iterator, Optional, Tuple
+
+RESULTS_DIR = os.getenv("RESULTS_DIR", "results")
+# À incrémenter à chaque changement des extracteurs (extract_skills,
+# segment_cv, ...) pour que les PDF déjà analysés soient ré-analysés ;
+# reconstruire ensuite les statistiques (python stats.py rebuild).
+ANALYZER_VERSION = "1"
+
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def is_sha256(value: str) -> bool:
+    return bool(_SHA256_RE.match(value))
+
+
+def _version_dir() -> str:
+    return os.path.join(RESULTS_DIR, f"v{ANALYZER_VERSION}")
+
+
+def _path(digest: str) -> str:
+    return os.path.join(_version_dir(), digest[:2], f"{digest}.json")
+
+
+def load(digest: str) -> Optional[Dict]:
+    """Retourne le résultat stocké pour cette empreinte, ou None."""
+    try:
+        with open(_path(digest), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save(digest: str, result: Dict) -> bool:
+    """Enregistre un résultat (écriture atomique). Retourne True s'il est nouveau."""
+    path = _path(digest)
+    is_new = not os.path.exists(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return is_new
+
+
+def iter_items() -> Iterator[Tuple[str, Dict]]:
+    """Itère sur (empreinte, résultat) pour la version courante de l'analyseur."""
+    version_dir = _version_dir()
+    if not os.path.isdir(version_dir):
+        return
+    for shard in sorted(os.listdir(version_dir)):
+        shard_dir = os.path.join(version_dir, shard)
+        if not os.path.isdir(shard_dir):
+            continue
+        for name in sorted(os.listdir(shard_dir)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(shard_dir, name), encoding="utf-8") as f:
+                    yield name[:-len(".json")], json.load(f)
+            except (OSError, ValueError):
+                continue
+
+
+def iter_results() -> Iterator[Dict]:
+    """Itère sur tous les résultats stockés pour la version courante de l'analyseur."""
+    for _, result in iter_items():
+        yield result
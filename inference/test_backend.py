@@ -4,6 +4,7 @@ Script de test pour l'API d'analyse de CV
 """
 
 import requests
+import hashlib
 import json
 import sys
 from pathlib import Path
@@ -39,9 +40,18 @@ def test_analyze_cv(pdf_path):
     
     try:
         with open(pdf_path, "rb") as f:
+            pdf_bytes = f.read()
+        
+        # Protocole par empreinte : n'envoyer le PDF que si l'analyse est inconnue
+        digest = hashlib.sha256(pdf_bytes).hexdigest()
+        response = requests.get(f"{BACKEND_URL}/analyses/{digest}", timeout=10)
+        if response.status_code == 200:
+            print(f"♻️  Analyse déjà connue du serveur (sha256={digest[:12]}…), PDF non envoyé")
+        else:
+            print(f"📤 Analyse inconnue (sha256={digest[:12]}…), envoi du PDF")
             response = requests.post(
                 f"{BACKEND_URL}/analyze-cv",
-                files={"file": f},
+                files={"file": (Path(pdf_path).name, pdf_bytes, "application/pdf")},
                 timeout=30
             )
         
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Tests du pool de workers d'analyse (budgets, crash, remplacement)
+
+Usage :
+    python -m pytest test_workers.py
+    python test_workers.py
+"""
+
+import os
+
+import metrics
+from workers import BudgetExceeded, WorkerPool
+
+
+def _analyze(value, on_stage):
+    on_stage("extract_text")
+    if value == "crash":
+        # Arrêt brutal du processus, comme un segfault de fitz ou l'OOM killer
+        os._exit(1)
+    return value
+
+
+def _kills(reason: str, stage: str) -> float:
+    return metrics._values.get(metrics._key("cv_worker_kills_total", {"reason": reason, "stage": stage}), 0)
+
+
+def test_worker_crash():
+    """Un worker mort en cours d'analyse est signalé comme crash, avec l'étape, puis remplacé."""
+    pool = WorkerPool(_analyze, size=1)
+    pool.start()
+    kills_before = _kills("crash", "extract_text")
+    try:
+        try:
+            pool.run("crash")
+        except BudgetExceeded as e:
+            assert e.reason == "crash"
+            assert e.stage == "extract_text"
+        else:
+            raise AssertionError("BudgetExceeded attendu")
+        assert _kills("crash", "extract_text") == kills_before + 1
+        assert pool.run("cv") == "cv"
+    finally:
+        pool.shutdown()
+
+
+def main():
+    test_worker_crash()
+    print("✅ test_worker_crash")
+
+
+if __name__ == "__main__":
+    main()
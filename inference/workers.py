@@ -0,0 +1,273 @@
+"""
+Pool de processus d'analyse avec budgets de temps et de mémoire
+
+Chaque analyse s'exécute dans un processus dédié et surveillé :
+- si elle dépasse ANALYSIS_TIMEOUT_S ou ANALYSIS_MAX_RSS_MB, le processus
+  est tué, remplacé, et l'erreur indique l'étape en cours ;
+- un processus est recyclé après WORKER_MAX_DOCS documents ou quand son
+  RSS dépasse WORKER_RECYCLE_RSS_MB, pour contenir les fuites natives.
+
+Le RSS mesuré est celui de tout le groupe de processus du worker, y compris
+les processus d'extraction parallèle des pages qu'il crée (l'application
+ajoute leur empreinte estimée aux budgets, voir PDF_EXTRACT_PROCESS_RSS_MB).
+"""
+
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from typing import Callable, Optional
+
+import metrics
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+ANALYSIS_TIMEOUT_S = float(os.getenv("ANALYSIS_TIMEOUT_S", "20"))
+ANALYSIS_MAX_RSS_MB = int(os.getenv("ANALYSIS_MAX_RSS_MB", "1024"))
+WORKER_MAX_DOCS = int(os.getenv("WORKER_MAX_DOCS", "500"))
+WORKER_RECYCLE_RSS_MB = int(os.getenv("WORKER_RECYCLE_RSS_MB", "512"))
+# Délai maximal de démarrage d'un worker (imports de fitz, fastapi...)
+WORKER_START_TIMEOUT_S = float(os.getenv("WORKER_START_TIMEOUT_S", "60"))
+
+# Intervalle de surveillance d'une analyse en cours, en secondes
+POLL_INTERVAL_S = 0.05
+
+metrics.describe("cv_worker_kills_total", "counter",
+                 "Processus d'analyse tués pour dépassement de budget")
+metrics.describe("cv_worker_recycles_total", "counter",
+                 "Processus d'analyse recyclés (nombre de documents ou RSS)")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+class AnalysisError(Exception):
+    """Échec d'une analyse ; `stage` est l'étape du pipeline en cours."""
+
+    def __init__(self, stage: str, detail: str):
+        super().__init__(detail)
+        self.stage = stage
+
+
+class BudgetExceeded(AnalysisError):
+    """Une analyse a dépassé son budget (`reason` : timeout, memory ou crash)."""
+
+    def __init__(self, stage: str, reason: str, detail: str):
+        super().__init__(stage, detail)
+        self.reason = reason
+
+
+def _read_group_rss_mb(pgid: int) -> float:
+    """RSS cumulé (en Mo) des processus du groupe `pgid`, lu dans /proc."""
+    pages = 0
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                stat = f.read()
+            # Champs après "(comm)" : état, ppid, pgrp, ... rss (24e champ)
+            fields = stat[stat.rindex(")") + 2:].split()
+            if int(fields[2]) == pgid:
+                pages += int(fields[21])
+        except (OSError, ValueError, IndexError):
+            continue
+    return pages * _PAGE_SIZE / (1024 * 1024)
+
+
+def _worker_main(conn, stage, target: Callable):
+    # Groupe de processus propre : les éventuels sous-processus (extraction
+    # parallèle des pages) sont comptés dans le RSS et tués avec le worker.
+    os.setpgrp()
+
+    def on_stage(name: str):
+        stage.value = name.encode()
+
+    # Les imports sont faits : le worker peut recevoir des analyses
+    conn.send(("ready",))
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        args, kwargs = job
+        try:
+            conn.send(("ok", target(*args, on_stage=on_stage, **kwargs)))
+        except Exception as e:
+            conn.send(("error", str(e), stage.value.decode()))
+        stage.value = b""
+
+
+class AnalysisWorker:
+    """Un processus d'analyse et son canal de communication."""
+
+    def __init__(self, ctx, target: Callable):
+        self.conn, child_conn = ctx.Pipe()
+        self.stage = ctx.Array("c", 64)
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, self.stage, target))
+        self.process.start()
+        child_conn.close()
+        self.docs_processed = 0
+
+    @property
+    def rss_mb(self) -> float:
+        return _read_group_rss_mb(self.process.pid)
+
+    def wait_ready(self, timeout_s: float):
+        """Attend la fin du démarrage du worker, sans décompter le budget d'une analyse."""
+        if not self.conn.poll(timeout_s):
+            self.kill()
+            raise RuntimeError(f"Le worker d'analyse n'a pas démarré en {timeout_s:g}s")
+        try:
+            self.conn.recv()
+        except EOFError:
+            self.kill()
+            raise RuntimeError("Le worker d'analyse s'est arrêté au démarrage")
+
+    def kill(self):
+        if self.conn.closed:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        # Si le groupe n'existait pas encore (arrêt avant os.setpgrp)
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        """Arrêt propre, puis forcé si le processus ne répond pas."""
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        self.kill()
+
+    def run(self, args: tuple, kwargs: dict, timeout_s: float, max_rss_mb: float):
+        self.conn.send((args, kwargs))
+        deadline = time.monotonic() + timeout_s
+        while not self.conn.poll(POLL_INTERVAL_S):
+            stage = self.stage.value.decode() or "startup"
+            if not self.process.is_alive():
+                raise BudgetExceeded(stage, "crash", "Le processus d'analyse s'est arrêté brutalement")
+            if time.monotonic() > deadline:
+                raise BudgetExceeded(stage, "timeout", f"Temps d'analyse dépassé ({timeout_s:g}s)")
+            if self.rss_mb > max_rss_mb:
+                raise BudgetExceeded(stage, "memory", f"Mémoire d'analyse dépassée ({max_rss_mb} Mo)")
+
+        self.docs_processed += 1
+        # poll() rend aussi la main sur EOF : le processus est mort en cours
+        # d'analyse (segfault de fitz, OOM killer...)
+        stage = self.stage.value.decode() or "startup"
+        try:
+            message = self.conn.recv()
+        except EOFError:
+            raise BudgetExceeded(stage, "crash", "Le processus d'analyse s'est arrêté brutalement")
+        if message[0] == "error":
+            _, detail, stage = message
+            raise AnalysisError(stage or "startup", detail)
+        return message[1]
+
+
+class WorkerPool:
+    """Répartit les analyses sur des processus surveillés et recyclés."""
+
+    def __init__(self, target: Callable, size: int = ANALYSIS_WORKERS,
+                 timeout_s: float = ANALYSIS_TIMEOUT_S, max_rss_mb: float = ANALYSIS_MAX_RSS_MB,
+                 max_docs: int = WORKER_MAX_DOCS, recycle_rss_mb: float = WORKER_RECYCLE_RSS_MB):
+        self.target = target
+        self.size = size
+        self.timeout_s = timeout_s
+        self.max_rss_mb = max_rss_mb
+        self.max_docs = max_docs
+        self.recycle_rss_mb = recycle_rss_mb
+        # "spawn" évite de dupliquer les threads et verrous du serveur
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[AnalysisWorker]" = queue.Queue()
+        self._workers = []
+        self._replacing = []
+        self._closed = False
+
+    def _spawn(self) -> AnalysisWorker:
+        worker = AnalysisWorker(self._ctx, self.target)
+        self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker: AnalysisWorker, graceful: bool):
+        """Arrête `worker` et met un remplaçant prêt dans la file des workers libres."""
+        self._workers.remove(worker)
+        if graceful:
+            worker.stop()
+        else:
+            worker.kill()
+        while not self._closed:
+            replacement = self._spawn()
+            try:
+                replacement.wait_ready(WORKER_START_TIMEOUT_S)
+            except RuntimeError:
+                self._workers.remove(replacement)
+                time.sleep(1)
+                continue
+            self._idle.put(replacement)
+            return
+
+    def _release(self, worker: AnalysisWorker):
+        """Rend le worker disponible, ou le remplace s'il est mort ou doit être recyclé.
+
+        Le remplacement se fait en tâche de fond pour ne pas retarder la réponse.
+        """
+        if not worker.process.is_alive():
+            graceful = False
+        else:
+            reason = self._recycle_reason(worker)
+            if not reason:
+                self._idle.put(worker)
+                return
+            metrics.inc("cv_worker_recycles_total", reason=reason)
+            graceful = True
+        thread = threading.Thread(target=self._replace, args=(worker, graceful), daemon=True)
+        self._replacing = [t for t in self._replacing if t.is_alive()] + [thread]
+        thread.start()
+
+    def start(self):
+        workers = [self._spawn() for _ in range(self.size)]
+        for worker in workers:
+            worker.wait_ready(WORKER_START_TIMEOUT_S)
+            self._idle.put(worker)
+
+    def shutdown(self):
+        self._closed = True
+        for thread in self._replacing:
+            thread.join()
+        for worker in list(self._workers):
+            worker.stop()
+        self._workers = []
+
+    def run(self, *args, timeout_s: Optional[float] = None, **kwargs):
+        """Exécute `target(*args, **kwargs)` dans un worker (appel bloquant).
+
+        `timeout_s` remplace le budget de temps du pool pour cette analyse.
+        Lève BudgetExceeded si un budget est dépassé (le worker fautif est
+        alors tué et remplacé), ou AnalysisError si le pipeline échoue.
+        """
+        worker = self._idle.get()
+        try:
+            return worker.run(args, kwargs, timeout_s or self.timeout_s, self.max_rss_mb)
+        except BudgetExceeded as e:
+            metrics.inc("cv_worker_kills_total", reason=e.reason, stage=e.stage)
+            worker.kill()
+            raise
+        finally:
+            self._release(worker)
+
+    def _recycle_reason(self, worker: AnalysisWorker) -> Optional[str]:
+        if worker.docs_processed >= self.max_docs:
+            return "max_docs"
+        if worker.rss_mb > self.recycle_rss_mb:
+            return "rss"
+        return None
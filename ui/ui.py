@@ -1,10 +1,14 @@
 import gradio as gr
 import requests
+import hashlib
 import os
 import json
 
 # URL du backend FastAPI
 BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000")
+# Clé d'API de l'interface (quota et priorité interactive côté backend)
+UI_API_KEY = os.getenv("UI_API_KEY", "")
+HEADERS = {"X-API-Key": UI_API_KEY} if UI_API_KEY else {}
 
 def format_summary(data):
     """Formate le résumé de manière lisible avec design moderne."""
@@ -137,20 +141,34 @@ def format_skills(data):
 def format_raw_json(data):
     return json.dumps(data, indent=2, ensure_ascii=False)
 
+def fetch_analysis(pdf_path):
+    """Récupère l'analyse d'un PDF, en ne l'envoyant que si le backend ne la connaît pas."""
+    with open(pdf_path, "rb") as f:
+        pdf_bytes = f.read()
+    
+    # Le backend indexe les analyses par empreinte SHA-256 du PDF
+    digest = hashlib.sha256(pdf_bytes).hexdigest()
+    response = requests.get(f"{BACKEND_URL}/analyses/{digest}", headers=HEADERS, timeout=10)
+    if response.status_code == 200:
+        return response.json()
+    if response.status_code != 404:
+        response.raise_for_status()
+    
+    response = requests.post(
+        f"{BACKEND_URL}/analyze-cv",
+        files={"file": (os.path.basename(pdf_path), pdf_bytes, "application/pdf")},
+        headers=HEADERS,
+        timeout=30
+    )
+    response.raise_for_status()
+    return response.json()
+
 def analyze_cv(pdf):
     if pdf is None:
         return "❌ Veuillez télécharger un fichier PDF", "", ""
     
     try:
-        with open(pdf, "rb") as f:
-            response = requests.post(
-                f"{BACKEND_URL}/analyze-cv",
-                files={"file": f},
-                timeout=30
-            )
-        
-        response.raise_for_status()
-        data = response.json()
+        data = fetch_analysis(pdf)
         
         return format_summary(data), format_skills(data), format_raw_json(data)
     